@@ -5,65 +5,305 @@ Stage 5: Multi-Day Data Collection
 """
 
 import argparse
+import atexit
+import contextlib
+import functools
+import gzip
+import io
+import itertools
 import json
+import logging
+import math
 import os
+import sqlite3
 import sys
+import tempfile
+import threading
 import time
-from datetime import datetime, timedelta
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from xml.etree.ElementTree import Element, ElementTree, SubElement, indent
+from xml.sax.saxutils import XMLGenerator
 
 try:
     import requests
+    from urllib3.util.retry import Retry
 except ImportError:
     requests = None
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+log = logging.getLogger('tvguide')
+
+# Number of concurrent API requests used by the multi-hour/multi-day fetchers
+DEFAULT_WORKERS = 8
+
+# Buffer size for the XMLTV output file
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+class FileCacheBackend:
+    """Cache backend storing each entry as a gzip-compressed JSON file"""
+    
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+    
+    def _get_filename(self, key, suffix=".json.gz"):
+        """Generate the filename of a cache entry (or of its validators sidecar)"""
+        return os.path.join(self.cache_dir, key + suffix)
+    
+    def location(self, key):
+        """Return where the entry for key is stored"""
+        return self._get_filename(key)
+    
+    def get(self, key, max_age):
+        """
+        Get a stored entry if it is younger than max_age seconds
+        
+        Returns:
+            tuple or None: (stored_at, body) if present and fresh, None otherwise
+        """
+        cache_file = self._get_filename(key)
+        # A single stat() covers both the existence and the age check
+        try:
+            mtime = os.stat(cache_file).st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime >= max_age:
+            return None
+        
+        try:
+            with open(cache_file, 'rb') as f:
+                return mtime, f.read()
+        except IOError:
+            return None
+    
+    def set(self, key, body, validators=None):
+        """Store an entry, replacing (or removing) its validators"""
+        with open(self._get_filename(key), 'wb') as f:
+            f.write(body)
+        
+        validators_file = self._get_filename(key, ".meta")
+        if validators is not None:
+            with open(validators_file, 'wb') as f:
+                f.write(validators)
+        elif os.path.exists(validators_file):
+            os.unlink(validators_file)
+    
+    def touch(self, key):
+        """Reset an entry's age to zero; returns False if it doesn't exist"""
+        try:
+            os.utime(self._get_filename(key))
+        except OSError:
+            return False
+        return True
+    
+    def get_validators(self, key):
+        """Get the encoded validators stored for an entry, or None"""
+        try:
+            with open(self._get_filename(key, ".meta"), 'rb') as f:
+                return f.read()
+        except IOError:
+            return None
+    
+    def clear(self):
+        """Delete every file in the cache directory"""
+        if os.path.exists(self.cache_dir):
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            os.unlink(entry.path)
+                    except OSError:
+                        pass
+    
+    def stats(self, exclude=()):
+        """Count cache entry files and their total size, skipping paths in exclude"""
+        if not os.path.exists(self.cache_dir):
+            return {'files': 0, 'total_size': 0}
+        
+        files = 0
+        total_size = 0
+        
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if (entry.name.endswith(('.json', '.json.gz'))
+                        and entry.path not in exclude
+                        and entry.is_file()):
+                    files += 1
+                    total_size += entry.stat().st_size
+        
+        return {'files': files, 'total_size': total_size}
+
+
+class SQLiteCacheBackend:
+    """Cache backend storing all entries in a single SQLite database"""
+    
+    def __init__(self, cache_dir, filename="cache.sqlite3"):
+        self.path = os.path.join(cache_dir, filename)
+        # One connection shared by the fetch threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, body BLOB NOT NULL, validators BLOB)"
+        )
+        atexit.register(self._conn.close)
+    
+    def location(self, key):
+        """Return where the entry for key is stored"""
+        return self.path
+    
+    def get(self, key, max_age):
+        """
+        Get a stored entry if it is younger than max_age seconds
+        
+        Returns:
+            tuple or None: (stored_at, body) if present and fresh, None otherwise
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stored_at, body FROM cache WHERE key = ? AND stored_at > ?",
+                (key, time.time() - max_age)
+            ).fetchone()
+    
+    def set(self, key, body, validators=None):
+        """Store an entry, replacing (or removing) its validators"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, stored_at, body, validators) VALUES (?, ?, ?, ?)",
+                (key, time.time(), body, validators)
+            )
+    
+    def touch(self, key):
+        """Reset an entry's age to zero; returns False if it doesn't exist"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE cache SET stored_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return cursor.rowcount > 0
+    
+    def get_validators(self, key):
+        """Get the encoded validators stored for an entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT validators FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def clear(self):
+        """Delete every cache entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+    
+    def stats(self, exclude=()):
+        """Count cache entries and their total (compressed) size"""
+        with self._lock:
+            files, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM cache"
+            ).fetchone()
+        return {'files': files, 'total_size': total_size}
+
+
+# Storage backends selectable with --cache-backend
+CACHE_BACKENDS = {
+    'files': FileCacheBackend,
+    'sqlite': SQLiteCacheBackend,
+}
+
 
 class CacheManager:
     """Manages disk cache for API responses"""
     
-    def __init__(self, cache_dir="cache"):
+    def __init__(self, cache_dir="cache", memory_size=2000, backend="files"):
+        if backend not in CACHE_BACKENDS:
+            raise ValueError(f"Unknown cache backend: {backend}")
         self.cache_dir = cache_dir
-        self.metadata_file = os.path.join(cache_dir, "metadata.json")
+        self.metadata_file = os.path.join(cache_dir, "metadata.json.gz")
+        # Uncompressed metadata written by older versions, migrated on save
+        self.legacy_metadata_file = os.path.join(cache_dir, "metadata.json")
+        self._metadata_lock = threading.Lock()
+        # Metadata is loaded on first save and written back once, at exit
+        self._metadata = None
+        self._metadata_dirty = False
+        atexit.register(self._flush_metadata)
+        # In-process LRU of (mtime, data) in front of the disk cache
+        self.memory_size = memory_size
+        self._mem = OrderedDict()
+        self._mem_lock = threading.Lock()
         self._ensure_cache_dir()
+        self.backend = CACHE_BACKENDS[backend](cache_dir)
     
     def _ensure_cache_dir(self):
         """Create cache directory if it doesn't exist"""
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
     
-    def _get_cache_filename(self, platform, region, date, hour):
-        """Generate cache filename for given parameters"""
-        return os.path.join(self.cache_dir, f"{platform}_{region}_{date}_{hour}.json")
+    def _get_cache_key(self, platform, region, date, hour):
+        """Generate the backend key for given parameters"""
+        return f"{platform}_{region}_{date}_{hour}"
     
     def _load_metadata(self):
         """Load cache metadata"""
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
+        try:
+            if os.path.exists(self.metadata_file):
+                with gzip.open(self.metadata_file, 'rb') as f:
+                    return _loads(f.read())
+            if os.path.exists(self.legacy_metadata_file):
+                with open(self.legacy_metadata_file, 'rb') as f:
+                    return _loads(f.read())
+        except (json.JSONDecodeError, IOError, EOFError, zlib.error):
+            pass
         return {}
     
+    def _write_file(self, path, payload):
+        """Write an already-encoded payload to disk in a single call"""
+        with open(path, 'wb') as f:
+            f.write(payload)
+    
     def _save_metadata(self, metadata):
-        """Save cache metadata"""
+        """Save cache metadata (compact JSON, gzipped at the fastest level)"""
+        payload = gzip.compress(_dumps(metadata), compresslevel=1)
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2)
+            self._write_file(self.metadata_file, payload)
+            if os.path.exists(self.legacy_metadata_file):
+                os.unlink(self.legacy_metadata_file)
         except IOError:
             pass  # Fail silently if we can't write metadata
     
-    def _is_cache_valid(self, cache_file, cache_ttl):
-        """Check if cache file is valid based on TTL"""
-        if not os.path.exists(cache_file):
-            return False
-        
-        # Get file modification time
-        mtime = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        age = datetime.now() - mtime
-        
-        return age.total_seconds() < cache_ttl
+    def _flush_metadata(self):
+        """Write pending metadata updates to disk"""
+        with self._metadata_lock:
+            if self._metadata_dirty:
+                self._save_metadata(self._metadata)
+                self._metadata_dirty = False
+    
+    def _remember(self, key, mtime, data):
+        """Store an entry in the in-memory LRU, evicting the oldest if full"""
+        with self._mem_lock:
+            self._mem[key] = (mtime, data)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_size:
+                self._mem.popitem(last=False)
     
     def get_cached_data(self, platform, region, date, hour, cache_ttl=3600):
         """
@@ -79,18 +319,85 @@ class CacheManager:
         Returns:
             dict or None: Cached data if valid, None otherwise
         """
-        cache_file = self._get_cache_filename(platform, region, date, hour)
+        entry = self.get_cached_entry(platform, region, date, hour, cache_ttl)
+        return None if entry is None else entry[1]
+    
+    def get_cached_entry(self, platform, region, date, hour, cache_ttl=3600):
+        """
+        Get cached data and the time it was stored, if available and valid
+        
+        Args:
+            platform: TV platform
+            region: Geographic region
+            date: Date string
+            hour: Hour number
+            cache_ttl: Cache time-to-live in seconds
+        
+        Returns:
+            tuple or None: (stored_at, data) if valid, None otherwise
+        """
+        key = (platform, region, date, hour)
+        with self._mem_lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+        if entry is not None and time.time() - entry[0] < cache_ttl:
+            return entry
         
-        if self._is_cache_valid(cache_file, cache_ttl):
+        try:
+            stored = self.backend.get(self._get_cache_key(*key), cache_ttl)
+        except sqlite3.Error:
+            stored = None
+        if stored is not None:
+            mtime, body = stored
             try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                data = _loads(gzip.decompress(body))
+            except (json.JSONDecodeError, OSError, EOFError, zlib.error):
+                # Corrupt, truncated or non-gzip (BadGzipFile) entries are misses
                 pass
+            else:
+                self._remember(key, mtime, data)
+                return mtime, data
         
         return None
     
-    def save_cached_data(self, platform, region, date, hour, data):
+    def get_validators(self, platform, region, date, hour):
+        """
+        Get the HTTP validators (ETag/Last-Modified) stored for a cache entry
+        
+        Returns:
+            dict or None: {'etag': ..., 'last_modified': ...} if stored, None otherwise
+        """
+        try:
+            payload = self.backend.get_validators(self._get_cache_key(platform, region, date, hour))
+            return _loads(payload) if payload else None
+        except (json.JSONDecodeError, sqlite3.Error):
+            return None
+    
+    def refresh_cached_data(self, platform, region, date, hour):
+        """
+        Mark an expired cache entry as fresh again, e.g. after a 304 Not Modified
+        
+        Returns:
+            dict or None: The cached data, or None if the entry no longer exists
+        """
+        key = (platform, region, date, hour)
+        try:
+            if not self.backend.touch(self._get_cache_key(*key)):
+                return None
+        except sqlite3.Error:
+            return None
+        
+        # Reuse the in-memory copy when there is one to skip re-parsing
+        with self._mem_lock:
+            entry = self._mem.get(key)
+        if entry is not None:
+            self._remember(key, time.time(), entry[1])
+            return entry[1]
+        
+        return self.get_cached_data(platform, region, date, hour, cache_ttl=float('inf'))
+    
+    def save_cached_data(self, platform, region, date, hour, data, validators=None, payload=None):
         """
         Save data to cache
         
@@ -100,74 +407,135 @@ class CacheManager:
             date: Date string
             hour: Hour number
             data: Data to cache
+            validators: Optional dict of HTTP validators ('etag', 'last_modified')
+            payload: Optional JSON bytes already encoding data (e.g. the raw
+                API response body); data is serialized if omitted
         """
-        cache_file = self._get_cache_filename(platform, region, date, hour)
+        cache_key = self._get_cache_key(platform, region, date, hour)
+        
+        # Encode up front so a serialization error never truncates an existing entry;
+        # level 1 compression is cheap and shrinks the repetitive JSON several times
+        if payload is None:
+            payload = _dumps(data)
+        payload = gzip.compress(payload, compresslevel=1)
         
         try:
-            # Save the data
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            # Save the data, with validators for conditional requests once the TTL expires
+            self.backend.set(
+                cache_key, payload,
+                _dumps(validators) if validators and any(validators.values()) else None
+            )
+            self._remember((platform, region, date, hour), time.time(), data)
             
-            # Update metadata
-            metadata = self._load_metadata()
-            cache_key = f"{platform}_{region}_{date}_{hour}"
-            metadata[cache_key] = {
-                'timestamp': datetime.now().isoformat(),
-                'file': cache_file,
-                'platform': platform,
-                'region': region,
-                'date': date,
-                'hour': hour
-            }
-            self._save_metadata(metadata)
+            # Update metadata (serialized so concurrent fetches don't lose entries)
+            with self._metadata_lock:
+                if self._metadata is None:
+                    self._metadata = self._load_metadata()
+                self._metadata[cache_key] = {
+                    'timestamp': datetime.now().isoformat(),
+                    'file': self.backend.location(cache_key),
+                    'platform': platform,
+                    'region': region,
+                    'date': date,
+                    'hour': hour
+                }
+                self._metadata_dirty = True
             
-        except IOError:
+        except (IOError, sqlite3.Error):
             pass  # Fail silently if we can't write cache
     
     def clear_cache(self):
         """Clear all cached data"""
-        if os.path.exists(self.cache_dir):
-            for filename in os.listdir(self.cache_dir):
-                file_path = os.path.join(self.cache_dir, filename)
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                except OSError:
-                    pass
+        with self._mem_lock:
+            self._mem.clear()
+        with self._metadata_lock:
+            self._metadata = None
+            self._metadata_dirty = False
+        self.backend.clear()
+        for path in (self.metadata_file, self.legacy_metadata_file):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
     
     def get_cache_stats(self):
         """Get cache statistics"""
-        if not os.path.exists(self.cache_dir):
-            return {'files': 0, 'total_size': 0}
-        
-        files = 0
-        total_size = 0
-        
-        for filename in os.listdir(self.cache_dir):
-            file_path = os.path.join(self.cache_dir, filename)
-            if os.path.isfile(file_path) and filename.endswith('.json'):
-                files += 1
-                total_size += os.path.getsize(file_path)
-        
-        return {'files': files, 'total_size': total_size}
+        self._flush_metadata()
+        return self.backend.stats(exclude=(self.metadata_file, self.legacy_metadata_file))
 
 
 class TVGuideAPIClient:
     """Client for fetching data from TV Guide API"""
     
-    def __init__(self, base_url="https://api-2.tvguide.co.uk/listings", cache_dir="cache"):
+    def __init__(self, base_url="https://api-2.tvguide.co.uk/listings", cache_dir="cache", max_retries=3,
+                 pool_size=32, ttl_past_hour=3600, ttl_current_hour=60, ttl_future=21600,
+                 cache_backend="files", max_stale=0):
         if requests is None:
             raise ImportError("requests library is required for API functionality. Install with: pip install requests")
         
         self.base_url = base_url
+        self.max_retries = max_retries
         self.session = requests.Session()
+        # Retries with exponential backoff (urllib3 2.x: immediately, then 2s, 4s, ...)
+        # happen inside the connection pool, and the pool is sized for the concurrent fetchers
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=1,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET'])
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
-        self.cache = CacheManager(cache_dir)
+        self.cache = CacheManager(cache_dir, backend=cache_backend)
+        # Adaptive cache TTLs, used when no fixed cache_ttl is given
+        self.ttl_past_hour = ttl_past_hour
+        self.ttl_current_hour = ttl_current_hour
+        self.ttl_future = ttl_future
+        # Expired entries younger than TTL + max_stale are served immediately
+        # while a background refresh updates the cache for the next run
+        self.max_stale = max_stale
+        self._refresh_pool = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+    
+    def _effective_ttl(self, date, hour, stored_at=None):
+        """
+        Pick a cache TTL for a (date, hour) slot based on how volatile it is
+        
+        Listings for past days never change, so entries fetched after the slot
+        ended are cached forever (one fetched earlier may hold a provisional
+        schedule and expires like an earlier hour of today); earlier hours of
+        today rarely change, the current hour may still be corrected, and
+        future hours are refreshed every few hours.
+        
+        Args:
+            date: Date in YYYY-MM-DD format (UTC, as used by the API)
+            hour: Hour in 24-hour format (0-23)
+            stored_at: When the cached entry was stored (epoch seconds); None
+                gives the longest TTL any entry for the slot can have
+        
+        Returns:
+            float: TTL in seconds
+        """
+        slot = _parse_date(date).replace(hour=hour, tzinfo=timezone.utc)
+        now = datetime.now(timezone.utc)
+        
+        if slot.date() < now.date():
+            if stored_at is None or stored_at >= (slot + timedelta(hours=1)).timestamp():
+                return math.inf
+            return self.ttl_past_hour
+        if slot + timedelta(hours=1) <= now:
+            return self.ttl_past_hour
+        if slot <= now:
+            return self.ttl_current_hour
+        return self.ttl_future
     
-    def fetch_listings(self, platform, region, date, hour, view="grid", details=False, timeout=30, max_retries=3, 
-                      use_cache=True, cache_ttl=3600, cache_only=False):
+    def fetch_listings(self, platform, region, date, hour, view="grid", details=False, timeout=30,
+                      use_cache=True, cache_ttl=None, cache_only=False):
         """
         Fetch TV listings from the API with caching support
         
@@ -179,9 +547,8 @@ class TVGuideAPIClient:
             view: Display format (default: "grid")
             details: Include additional details (default: False)
             timeout: Request timeout in seconds
-            max_retries: Maximum number of retry attempts
             use_cache: Whether to use cache (default: True)
-            cache_ttl: Cache time-to-live in seconds (default: 3600)
+            cache_ttl: Cache time-to-live in seconds (default: None, adaptive per slot)
             cache_only: Only use cache, don't make API calls (default: False)
         
         Returns:
@@ -191,62 +558,214 @@ class TVGuideAPIClient:
             requests.RequestException: If API request fails
             ValueError: If response format is invalid or cache_only with no cache
         """
-        # Try cache first if enabled
-        if use_cache:
-            cached_data = self.cache.get_cached_data(platform, region, date, hour, cache_ttl)
-            if cached_data is not None:
-                return cached_data
+        params = self._listing_params(platform, region, view, details, date, hour)
+        return self._fetch_one(params, timeout, use_cache, cache_ttl, cache_only)
+    
+    def _listing_params(self, platform, region, view="grid", details=False, date=None, hour=None):
+        """
+        Build the query parameters for a listings request
         
-        # If cache_only mode and no cache hit, raise error
-        if cache_only:
-            raise ValueError(f"No cached data available for {platform}_{region}_{date}_{hour} and cache_only mode is enabled")
-        params = {
+        date and hour may be left as None to build a base dict that callers
+        fill in per request; keys keep the same order either way.
+        """
+        return {
             'platform': platform,
             'region': region,
             'view': view,
             'date': date,
-            'hour': str(hour),
+            'hour': None if hour is None else str(hour),
             'details': str(details).lower()
         }
+    
+    def _fetch_one(self, params, timeout=30, use_cache=True, cache_ttl=None, cache_only=False):
+        """Fetch listings for a prepared params dict, going through the cache (see fetch_listings)"""
+        platform = params['platform']
+        region = params['region']
+        date = params['date']
+        hour = int(params['hour'])
         
-        last_exception = None
+        # Try cache first if enabled
+        if use_cache:
+            adaptive = cache_ttl is None
+            if adaptive:
+                # Upper bound for the lookup, narrowed once the entry's age is known
+                cache_ttl = self._effective_ttl(date, hour)
+            entry = self.cache.get_cached_entry(platform, region, date, hour, cache_ttl + self.max_stale)
+            if entry is not None:
+                stored_at, cached_data = entry
+                if adaptive:
+                    cache_ttl = self._effective_ttl(date, hour, stored_at)
+                age = time.time() - stored_at
+                if age < cache_ttl + self.max_stale:
+                    if age >= cache_ttl and not cache_only:
+                        self._refresh_in_background(params, timeout)
+                    return cached_data
         
-        for attempt in range(max_retries + 1):
-            try:
-                response = self.session.get(
-                    self.base_url,
-                    params=params,
-                    timeout=timeout
-                )
+        # If cache_only mode and no cache hit, raise error
+        if cache_only:
+            raise ValueError(f"No cached data available for {platform}_{region}_{date}_{hour} and cache_only mode is enabled")
+        
+        return self._download(params, timeout, use_cache)
+    
+    def _refresh_in_background(self, params, timeout=30):
+        """Queue a refresh of a stale cache entry, unless one is already in flight"""
+        key = (params['platform'], params['region'], params['date'], params['hour'])
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS)
+        self._refresh_pool.submit(self._refresh, key, params, timeout)
+    
+    def _refresh(self, key, params, timeout=30):
+        """Re-download a stale cache entry; on failure the stale copy is kept"""
+        try:
+            self._download(params, timeout, use_cache=True)
+        except (requests.RequestException, ValueError):
+            pass
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+    
+    def _download(self, params, timeout=30, use_cache=True):
+        """Request listings from the API, revalidating and updating the cache entry"""
+        platform = params['platform']
+        region = params['region']
+        date = params['date']
+        hour = int(params['hour'])
+        
+        # Revalidate an expired cache entry instead of re-downloading it
+        headers = {}
+        if use_cache:
+            validators = self.cache.get_validators(platform, region, date, hour)
+            if validators:
+                if validators.get('etag'):
+                    headers['If-None-Match'] = validators['etag']
+                if validators.get('last_modified'):
+                    headers['If-Modified-Since'] = validators['last_modified']
+        
+        try:
+            response = self.session.get(
+                self.base_url,
+                params=params,
+                headers=headers,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            
+            if response.status_code == 304:
+                cached_data = self.cache.refresh_cached_data(platform, region, date, hour)
+                if cached_data is not None:
+                    return cached_data
+                # Cache entry vanished since we asked; fetch the full body
+                response = self.session.get(self.base_url, params=params, timeout=timeout)
                 response.raise_for_status()
-                
-                # Validate JSON response
-                try:
-                    data = response.json()
-                except json.JSONDecodeError as e:
-                    raise ValueError(f"Invalid JSON response from API: {e}")
-                
-                if not isinstance(data, list):
-                    raise ValueError("Expected JSON array from API response")
-                
-                # Cache the successful response if caching is enabled
-                if use_cache:
-                    self.cache.save_cached_data(platform, region, date, hour, data)
-                
-                return data
-                
-            except requests.RequestException as e:
-                last_exception = e
-                if attempt < max_retries:
-                    # Exponential backoff: 1s, 2s, 4s
-                    wait_time = 2 ** attempt
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    break
+        except requests.exceptions.RetryError as e:
+            # Only retryable statuses get here, once every retry has been used up
+            raise requests.RequestException(f"API request failed after {self.max_retries + 1} attempts: {e}")
+        
+        # Validate JSON response (decoded straight from bytes, no str round-trip)
+        try:
+            data = _loads(response.content)
+        except json.JSONDecodeError as e:
+            content_type = response.headers.get('Content-Type', '')
+            if 'json' in content_type:
+                raise ValueError(f"Invalid JSON response from API: {e}")
+            # Likely an HTML/text error page; only now is the body decoded as text
+            raise ValueError(f"Non-JSON response from API ({content_type or 'no Content-Type'}): "
+                             f"{response.text[:200]!r}")
+        
+        if not isinstance(data, list):
+            raise ValueError("Expected JSON array from API response")
         
-        # If we get here, all retries failed
-        raise requests.RequestException(f"API request failed after {max_retries + 1} attempts: {last_exception}")
+        # Cache the successful response if caching is enabled
+        if use_cache:
+            validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+            # Store the response body as-is instead of re-serializing it
+            self.cache.save_cached_data(platform, region, date, hour, data, validators,
+                                        payload=response.content)
+        
+        return data
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD string into a datetime at midnight, without strptime"""
+    if (len(value) != 10 or value[4] != '-' or value[7] != '-'
+            or not (value[:4] + value[5:7] + value[8:]).isdigit()):
+        raise ValueError(f"time data {value!r} does not match format 'YYYY-MM-DD'")
+    return datetime(int(value[:4]), int(value[5:7]), int(value[8:]))
+
+
+def _format_date(dt):
+    """Format a datetime as YYYY-MM-DD, without strftime"""
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+
+
+if sys.version_info >= (3, 11):
+    # fromisoformat accepts a trailing 'Z' natively from Python 3.11
+    _fromisoformat = datetime.fromisoformat
+else:
+    def _fromisoformat(value):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+# One shared tzinfo per UTC offset, rather than one per parsed start_at string
+_tz_cache = {}
+
+
+def _intern(value):
+    """Intern a repeated string value; anything else (e.g. null) is returned as-is"""
+    return sys.intern(value) if type(value) is str else value
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_start_at(value):
+    """Parse an ISO 8601 start_at string; schedules repeat the same values a lot"""
+    dt = _fromisoformat(value)
+    if dt.tzinfo is not None:
+        tz = _tz_cache.setdefault(dt.utcoffset(), dt.tzinfo)
+        if tz is not dt.tzinfo:
+            dt = dt.replace(tzinfo=tz)
+    return dt
+
+
+@functools.lru_cache(maxsize=4096)
+def _xmltv_time(dt, offset):
+    """
+    Format a datetime as YYYYMMDDhhmmss +ZZZZ without going through strftime
+    
+    The UTC offset is part of the cache key because aware datetimes that refer
+    to the same instant compare (and hash) equal regardless of their timezone.
+    """
+    text = f"{dt.year:04d}{dt.month:02d}{dt.day:02d}{dt.hour:02d}{dt.minute:02d}{dt.second:02d} "
+    if offset is None:
+        return text
+    
+    minutes = int(offset.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"{text}{sign}{hours:02d}{minutes:02d}"
+
+
+@dataclass(slots=True)
+class Programme:
+    """A single parsed programme (slotted to keep large guides compact)"""
+    pa_id: str
+    title: str
+    type: str
+    start: datetime
+    stop: datetime
+    channel: str
+    image_url: str
+    new: bool
+
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLTV_DOCTYPE = '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
 
 
 class TVGuideConverter:
@@ -259,14 +778,43 @@ class TVGuideConverter:
     def parse_json(self, json_data):
         """Parse TV Guide JSON data and extract channels and programmes"""
         try:
-            data = json.loads(json_data) if isinstance(json_data, str) else json_data
+            data = _loads(json_data) if isinstance(json_data, (str, bytes)) else json_data
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON data: {e}")
         
         if not isinstance(data, list):
             raise ValueError("Expected JSON array of channel objects")
         
-        for channel_data in data:
+        self.parse_channel_stream(data)
+    
+    def parse_json_stream(self, fp):
+        """
+        Parse TV Guide JSON from a binary file object
+        
+        With ijson installed, channel objects are decoded and parsed one at a
+        time so the whole document is never materialized; otherwise the file
+        is read and decoded in one go.
+        """
+        if ijson is None:
+            try:
+                data = _loads(fp.read())
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON data: {e}")
+            self.parse_json(data)
+            return
+        
+        events = ijson.parse(fp, use_float=True)
+        try:
+            first = next(events, None)
+            if first is None or first[1] != 'start_array':
+                raise ValueError("Expected JSON array of channel objects")
+            self.parse_channel_stream(ijson.items(itertools.chain([first], events), 'item'))
+        except ijson.JSONError as e:
+            raise ValueError(f"Invalid JSON data: {e}")
+    
+    def parse_channel_stream(self, channels):
+        """Parse already-decoded channel objects from any iterable, one at a time"""
+        for channel_data in channels:
             self._parse_channel(channel_data)
     
     def _parse_channel(self, channel_data):
@@ -277,7 +825,7 @@ class TVGuideConverter:
                 raise ValueError(f"Missing required field '{field}' in channel data")
         
         # Use slug as channel ID, fallback to pa_id if slug not available
-        channel_id = channel_data.get('slug', channel_data['pa_id'])
+        channel_id = _intern(channel_data.get('slug', channel_data['pa_id']))
         
         # Store channel information
         self.channels[channel_id] = {
@@ -302,40 +850,32 @@ class TVGuideConverter:
         
         # Parse start time
         try:
-            start_time = datetime.fromisoformat(schedule['start_at'].replace('Z', '+00:00'))
+            start_time = _parse_start_at(schedule['start_at'])
         except ValueError as e:
             raise ValueError(f"Invalid start_at format: {e}")
         
-        # Calculate stop time
+        # Calculate stop time (plain arithmetic, no timestamp round-trip)
         duration_minutes = schedule['duration']
-        stop_time = start_time.replace(microsecond=0)
-        stop_time = stop_time.replace(second=0)
-        # Add duration
-        stop_time = datetime.fromtimestamp(
-            stop_time.timestamp() + (duration_minutes * 60),
-            tz=start_time.tzinfo
-        )
+        stop_time = start_time + timedelta(minutes=duration_minutes)
         
-        programme = {
-            'pa_id': schedule['pa_id'],
-            'title': schedule['title'],
-            'type': schedule.get('type', ''),
-            'start': start_time,
-            'stop': stop_time,
-            'channel': channel_id,
-            'image_url': schedule.get('image_url', ''),
-            'new': schedule.get('new', False)
-        }
+        # Titles and types repeat throughout a week of listings; keep one copy of each
+        programme = Programme(
+            pa_id=schedule['pa_id'],
+            title=_intern(schedule['title']),
+            type=_intern(schedule.get('type') or ''),
+            start=start_time,
+            stop=stop_time,
+            channel=channel_id,
+            image_url=schedule.get('image_url', ''),
+            new=schedule.get('new', False)
+        )
         
         self.programmes.append(programme)
     
     def generate_xmltv(self):
         """Generate XMLTV XML from parsed data"""
         # Create root element
-        tv = Element('tv')
-        tv.set('date', datetime.now().strftime('%Y%m%d%H%M%S +0000'))
-        tv.set('source-info-name', 'TV Guide API')
-        tv.set('generator-info-name', 'tvguide2xmltv/1.0')
+        tv = Element('tv', self._tv_attributes())
         
         # Add channel elements
         for channel_id, channel_data in self.channels.items():
@@ -352,57 +892,256 @@ class TVGuideConverter:
                 icon.set('src', channel_data['logo_url'])
         
         # Add programme elements
+        format_time = self._format_xmltv_time
         for programme in self.programmes:
             prog_elem = SubElement(tv, 'programme')
-            prog_elem.set('start', self._format_xmltv_time(programme['start']))
-            prog_elem.set('stop', self._format_xmltv_time(programme['stop']))
-            prog_elem.set('channel', programme['channel'])
+            prog_elem.set('start', format_time(programme.start))
+            prog_elem.set('stop', format_time(programme.stop))
+            prog_elem.set('channel', programme.channel)
             
             # Title
             title = SubElement(prog_elem, 'title')
-            title.text = programme['title']
+            title.text = programme.title
             
             # Category (from type)
-            if programme['type']:
+            if programme.type:
                 category = SubElement(prog_elem, 'category')
-                category.text = programme['type']
+                category.text = programme.type
             
             # Icon (image)
-            if programme['image_url']:
+            if programme.image_url:
                 icon = SubElement(prog_elem, 'icon')
-                icon.set('src', programme['image_url'])
+                icon.set('src', programme.image_url)
             
             # New flag
-            if programme['new']:
+            if programme.new:
                 SubElement(prog_elem, 'new')
         
         return tv
     
+    def _tv_attributes(self):
+        """Attributes of the root <tv> element"""
+        return {
+            'date': datetime.now().strftime('%Y%m%d%H%M%S +0000'),
+            'source-info-name': 'TV Guide API',
+            'generator-info-name': 'tvguide2xmltv/1.0'
+        }
+    
     def _format_xmltv_time(self, dt):
         """Format datetime for XMLTV (YYYYMMDDhhmmss +ZZZZ)"""
-        return dt.strftime('%Y%m%d%H%M%S %z')
+        return _xmltv_time(dt, dt.utcoffset())
     
-    def to_xml_string(self, tv_element):
-        """Convert XML element to formatted string with DOCTYPE"""
-        # Convert to string
-        rough_string = tostring(tv_element, encoding='unicode')
+    def write_xmltv(self, fp, pretty=False):
+        """
+        Write XMLTV with DOCTYPE to a file object
+        
+        Elements are emitted one at a time with XMLGenerator as the parsed data
+        is walked, so neither an element tree nor the serialized document is
+        ever held in memory.
+        
+        Args:
+            fp: Writable binary (UTF-8 is written) or text file object
+            pretty: Indent elements on their own lines (default: False, compact)
+        """
+        # XMLGenerator would wrap a binary file itself, but the declaration and
+        # DOCTYPE are written alongside it so share one text layer; it batches
+        # the many small writes and encodes them in chunks (detach() flushes)
+        out = fp if isinstance(fp, io.TextIOBase) else io.TextIOWrapper(
+            fp, encoding='utf-8', errors='xmlcharrefreplace', newline='\n')
+        gen = XMLGenerator(out, encoding='UTF-8', short_empty_elements=True)
+        # Bound once; these are called several times per programme
+        start = gen.startElement
+        end = gen.endElement
+        text = gen.characters
+        if pretty:
+            whitespace = gen.ignorableWhitespace
+        else:
+            def whitespace(content):
+                pass
+        
+        out.write(XML_DECLARATION)
+        out.write(XMLTV_DOCTYPE)
+        start('tv', self._tv_attributes())
+        
+        # Add channel elements
+        for channel_id, channel_data in self.channels.items():
+            whitespace('\n  ')
+            start('channel', {'id': channel_id})
+            
+            # Display name
+            whitespace('\n    ')
+            start('display-name', {})
+            text(channel_data['title'])
+            end('display-name')
+            
+            # Icon (logo)
+            if channel_data['logo_url']:
+                whitespace('\n    ')
+                start('icon', {'src': channel_data['logo_url']})
+                end('icon')
+            
+            whitespace('\n  ')
+            end('channel')
+        
+        # Add programme elements
+        format_time = self._format_xmltv_time
+        for programme in self.programmes:
+            whitespace('\n  ')
+            start('programme', {
+                'start': format_time(programme.start),
+                'stop': format_time(programme.stop),
+                'channel': programme.channel
+            })
+            
+            # Title
+            whitespace('\n    ')
+            start('title', {})
+            text(programme.title)
+            end('title')
+            
+            # Category (from type)
+            if programme.type:
+                whitespace('\n    ')
+                start('category', {})
+                text(programme.type)
+                end('category')
+            
+            # Icon (image)
+            if programme.image_url:
+                whitespace('\n    ')
+                start('icon', {'src': programme.image_url})
+                end('icon')
+            
+            # New flag
+            if programme.new:
+                whitespace('\n    ')
+                start('new', {})
+                end('new')
+            
+            whitespace('\n  ')
+            end('programme')
+        
+        whitespace('\n')
+        end('tv')
+        out.write('\n')
+        gen.endDocument()
         
-        # Parse and format with minidom
-        reparsed = minidom.parseString(rough_string)
+        if out is not fp:
+            # Leave the caller's file open
+            out.detach()
+    
+    def to_xml_string(self, tv_element=None, pretty=False):
+        """
+        Convert XML element to string with DOCTYPE
         
-        # Get formatted XML without the default XML declaration
-        formatted = reparsed.documentElement.toprettyxml(indent='  ')
+        Args:
+            tv_element: Root element from generate_xmltv (default: stream the
+                parsed data without building a tree)
+            pretty: Indent elements on their own lines (default: False, compact)
+        """
+        buf = io.StringIO()
+        if tv_element is None:
+            self.write_xmltv(buf, pretty)
+            return buf.getvalue()
         
         # Add proper XML declaration and DOCTYPE
-        xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        doctype = '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+        buf.write(XML_DECLARATION)
+        buf.write(XMLTV_DOCTYPE)
         
-        return xml_declaration + doctype + formatted
+        # Pretty-print in place rather than re-parsing through minidom
+        if pretty:
+            indent(tv_element, space='  ')
+        ElementTree(tv_element).write(buf, encoding='unicode')
+        buf.write('\n')
+        return buf.getvalue()
+
+
+def _merge_channels(channels_dict, data):
+    """
+    Merge a list of channel objects into channels_dict, de-duplicating schedules
+    
+    channels_dict maps pa_id to a (channel, seen_schedules) pair; the set of
+    (pa_id, start_at) keys is kept alongside the channel so it is built once
+    rather than on every merge.
+    """
+    for channel in data:
+        pa_id = channel['pa_id']
+        if pa_id not in channels_dict:
+            # Copy so merging never mutates data held by the cache
+            schedules = list(channel['schedules'])
+            channels_dict[pa_id] = (
+                {**channel, 'schedules': schedules},
+                {(s['pa_id'], s['start_at']) for s in schedules}
+            )
+        else:
+            # Merge schedules, avoiding duplicates
+            merged, existing_schedules = channels_dict[pa_id]
+            for schedule in channel['schedules']:
+                schedule_key = (schedule['pa_id'], schedule['start_at'])
+                if schedule_key not in existing_schedules:
+                    existing_schedules.add(schedule_key)
+                    merged['schedules'].append(schedule)
+
+
+def _fetch_slots(api_client, platform, region, slots, view="grid", details=False, timeout=30,
+                 use_cache=True, cache_ttl=None, cache_only=False,
+                 max_workers=DEFAULT_WORKERS):
+    """
+    Fetch a list of (date, hour) slots concurrently and combine into a single dataset
+    
+    Requests run on a thread pool sharing the client's session; results are
+    merged on the calling thread in slot order so the output is deterministic.
+    
+    Returns:
+        iterator: Merged channel objects from all slots
+    """
+    # Dictionary to store channel data by pa_id to avoid duplicates
+    channels_dict = {}
+    
+    # Parameters shared by every slot are built once; each request gets its
+    # own copy since the dicts are used from several threads
+    base_params = api_client._listing_params(platform, region, view, details)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                api_client._fetch_one,
+                {**base_params, 'date': date, 'hour': str(hour)},
+                timeout=timeout,
+                use_cache=use_cache,
+                cache_ttl=cache_ttl,
+                cache_only=cache_only
+            )
+            for date, hour in slots
+        ]
+        
+        try:
+            for (date, hour), future in zip(slots, futures):
+                try:
+                    hour_data = future.result()
+                except ValueError as e:
+                    if cache_only and "No cached data available" in str(e):
+                        log.debug("    No cached data for %s hour %s, skipping...", date, hour)
+                        continue
+                    raise
+                
+                log.debug("  Fetched %s hour %s", date, hour)
+                
+                _merge_channels(channels_dict, hour_data)
+        except BaseException:
+            # Don't wait on requests that haven't started yet
+            for future in futures:
+                future.cancel()
+            raise
+    
+    # Hand channels straight to the consumer rather than copying them into a list
+    return (channel for channel, _ in channels_dict.values())
 
 
 def fetch_multiple_hours(api_client, platform, region, date, start_hour, end_hour, 
-                        view="grid", details=False, timeout=30, max_retries=3,
-                        use_cache=True, cache_ttl=3600, cache_only=False, verbose=False):
+                        view="grid", details=False, timeout=30,
+                        use_cache=True, cache_ttl=None, cache_only=False,
+                        max_workers=DEFAULT_WORKERS):
     """
     Fetch data for multiple hours and combine into a single dataset
     
@@ -416,72 +1155,40 @@ def fetch_multiple_hours(api_client, platform, region, date, start_hour, end_hou
         view: Display format
         details: Include additional details
         timeout: Request timeout
-        max_retries: Maximum retry attempts
         use_cache: Whether to use cache
-        cache_ttl: Cache time-to-live
+        cache_ttl: Cache time-to-live (None for adaptive per-slot TTLs)
         cache_only: Only use cached data
-        verbose: Enable verbose output
+        max_workers: Number of concurrent API requests
     
     Returns:
-        list: Combined JSON data from all hours
+        iterator: Merged channel objects from all hours
     """
     if start_hour > end_hour:
         raise ValueError("start_hour must be less than or equal to end_hour")
     
-    if verbose:
-        print(f"Fetching data for hours {start_hour} to {end_hour} on {date}")
+    log.debug("Fetching data for hours %s to %s on %s", start_hour, end_hour, date)
     
-    # Dictionary to store channel data by pa_id to avoid duplicates
-    channels_dict = {}
+    slots = [(date, hour) for hour in range(start_hour, end_hour + 1)]
     
-    # Fetch data for each hour
-    for hour in range(start_hour, end_hour + 1):
-        if verbose:
-            print(f"  Fetching hour {hour}...")
-        
-        try:
-            hour_data = api_client.fetch_listings(
-                platform=platform,
-                region=region,
-                date=date,
-                hour=hour,
-                view=view,
-                details=details,
-                timeout=timeout,
-                max_retries=max_retries,
-                use_cache=use_cache,
-                cache_ttl=cache_ttl,
-                cache_only=cache_only
-            )
-            
-            # Merge channel data
-            for channel in hour_data:
-                pa_id = channel['pa_id']
-                if pa_id not in channels_dict:
-                    channels_dict[pa_id] = channel
-                else:
-                    # Merge schedules, avoiding duplicates
-                    existing_schedules = {(s['pa_id'], s['start_at']) for s in channels_dict[pa_id]['schedules']}
-                    for schedule in channel['schedules']:
-                        schedule_key = (schedule['pa_id'], schedule['start_at'])
-                        if schedule_key not in existing_schedules:
-                            channels_dict[pa_id]['schedules'].append(schedule)
-                            
-        except ValueError as e:
-            if cache_only and "No cached data available" in str(e):
-                if verbose:
-                    print(f"    No cached data for hour {hour}, skipping...")
-                continue
-            else:
-                raise
-    
-    # Convert back to list format
-    return list(channels_dict.values())
+    return _fetch_slots(
+        api_client=api_client,
+        platform=platform,
+        region=region,
+        slots=slots,
+        view=view,
+        details=details,
+        timeout=timeout,
+        use_cache=use_cache,
+        cache_ttl=cache_ttl,
+        cache_only=cache_only,
+        max_workers=max_workers
+    )
 
 
 def fetch_multiple_days(api_client, platform, region, start_date, end_date, start_hour, end_hour,
-                       view="grid", details=False, timeout=30, max_retries=3,
-                       use_cache=True, cache_ttl=3600, cache_only=False, verbose=False):
+                       view="grid", details=False, timeout=30,
+                       use_cache=True, cache_ttl=None, cache_only=False,
+                       max_workers=DEFAULT_WORKERS):
     """
     Fetch data for multiple days and combine into a single dataset
     
@@ -489,94 +1196,58 @@ def fetch_multiple_days(api_client, platform, region, start_date, end_date, star
         api_client: TVGuideAPIClient instance
         platform: TV platform
         region: Geographic region
-        start_date: Start date in YYYY-MM-DD format
-        end_date: End date in YYYY-MM-DD format
+        start_date: Start date as a datetime or in YYYY-MM-DD format
+        end_date: End date as a datetime or in YYYY-MM-DD format
         start_hour: Starting hour (0-23)
         end_hour: Ending hour (0-23)
         view: Display format
         details: Include additional details
         timeout: Request timeout
-        max_retries: Maximum retry attempts
         use_cache: Whether to use cache
-        cache_ttl: Cache time-to-live
+        cache_ttl: Cache time-to-live (None for adaptive per-slot TTLs)
         cache_only: Only use cached data
-        verbose: Enable verbose output
+        max_workers: Number of concurrent API requests
     
     Returns:
-        list: Combined JSON data from all days and hours
+        iterator: Merged channel objects from all days and hours
     """
-    # Parse dates
+    # Parse dates, unless the caller already has them as datetimes
     try:
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        start_dt = start_date if isinstance(start_date, datetime) else _parse_date(start_date)
+        end_dt = end_date if isinstance(end_date, datetime) else _parse_date(end_date)
     except ValueError as e:
         raise ValueError(f"Invalid date format: {e}")
     
     if start_dt > end_dt:
         raise ValueError("start_date must be less than or equal to end_date")
     
-    if verbose:
-        print(f"Fetching data for dates {start_date} to {end_date}")
+    if start_hour > end_hour:
+        raise ValueError("start_hour must be less than or equal to end_hour")
     
-    # Dictionary to store channel data by pa_id to avoid duplicates
-    channels_dict = {}
+    # date() renders as YYYY-MM-DD, and only if the message is emitted
+    log.debug("Fetching data for dates %s to %s", start_dt.date(), end_dt.date())
     
-    # Iterate through each day
+    # Build every (date, hour) pair up front so the whole range shares one pool
+    slots = []
     current_date = start_dt
     while current_date <= end_dt:
-        date_str = current_date.strftime('%Y-%m-%d')
-        if verbose:
-            print(f"  Processing date {date_str}...")
-        
-        # For the last day, we might want to limit the end hour
-        current_end_hour = end_hour
-        if current_date.date() == end_dt.date():
-            current_end_hour = end_hour
-            
-        try:
-            # Fetch data for this day
-            day_data = fetch_multiple_hours(
-                api_client=api_client,
-                platform=platform,
-                region=region,
-                date=date_str,
-                start_hour=start_hour,
-                end_hour=current_end_hour,
-                view=view,
-                details=details,
-                timeout=timeout,
-                max_retries=max_retries,
-                use_cache=use_cache,
-                cache_ttl=cache_ttl,
-                cache_only=cache_only,
-                verbose=verbose
-            )
-            
-            # Merge channel data
-            for channel in day_data:
-                pa_id = channel['pa_id']
-                if pa_id not in channels_dict:
-                    channels_dict[pa_id] = channel
-                else:
-                    # Merge schedules
-                    existing_schedules = {(s['pa_id'], s['start_at']) for s in channels_dict[pa_id]['schedules']}
-                    for schedule in channel['schedules']:
-                        schedule_key = (schedule['pa_id'], schedule['start_at'])
-                        if schedule_key not in existing_schedules:
-                            channels_dict[pa_id]['schedules'].append(schedule)
-        except ValueError as e:
-            if cache_only and "No cached data available" in str(e):
-                if verbose:
-                    print(f"    No cached data for date {date_str}, skipping...")
-                current_date += timedelta(days=1)
-                continue
-            else:
-                raise
-        
+        date_str = _format_date(current_date)
+        slots.extend((date_str, hour) for hour in range(start_hour, end_hour + 1))
         current_date += timedelta(days=1)
     
-    # Convert back to list format
-    return list(channels_dict.values())
+    return _fetch_slots(
+        api_client=api_client,
+        platform=platform,
+        region=region,
+        slots=slots,
+        view=view,
+        details=details,
+        timeout=timeout,
+        use_cache=use_cache,
+        cache_ttl=cache_ttl,
+        cache_only=cache_only,
+        max_workers=max_workers
+    )
 
 
 def calculate_now_range(days=7):
@@ -595,14 +1266,50 @@ def calculate_now_range(days=7):
     start_time = now - timedelta(hours=1)
     end_time = now + timedelta(days=days)
     
-    start_date = start_time.strftime('%Y-%m-%d')
-    end_date = end_time.strftime('%Y-%m-%d')
+    start_date = _format_date(start_time)
+    end_date = _format_date(end_time)
     start_hour = start_time.hour
     end_hour = 23  # We'll fetch through the end of each day
     
     return start_date, end_date, start_hour, end_hour
 
 
+@contextlib.contextmanager
+def _atomic_output(path, mode='w', **kwargs):
+    """
+    Open a temporary file beside path for writing and move it into place on success
+    
+    If writing fails part-way, the temporary file is removed and any existing
+    file at path is left untouched.
+    
+    Args:
+        path: Final output file path
+        mode: File mode passed to open ('w' or 'wb')
+        **kwargs: Further arguments for open (encoding, buffering, ...)
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    # Keep the permissions of the file being replaced, or what open() would use
+    try:
+        permissions = os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        permissions = 0o666 & ~umask
+    
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            os.chmod(tmp_path, permissions)
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(
@@ -638,6 +1345,8 @@ Examples:
     
     # Output file path (optional for cache management commands)
     parser.add_argument('--output', help='Output XMLTV file path')
+    parser.add_argument('--pretty', action='store_true',
+                       help='Indent the XMLTV output for readability (default: compact)')
     
     # API parameters (required when --api is used)
     api_group = parser.add_argument_group('API options')
@@ -656,8 +1365,17 @@ Examples:
     
     # Cache options
     cache_group = parser.add_argument_group('Cache options')
-    cache_group.add_argument('--cache-ttl', type=int, default=3600,
-                           help='Cache time-to-live in seconds (default: 3600)')
+    cache_group.add_argument('--cache-ttl', type=int,
+                           help='Fixed cache time-to-live in seconds (default: adaptive, see below)')
+    cache_group.add_argument('--cache-ttl-current-hour', type=int, default=60,
+                           help='Adaptive TTL in seconds for the hour in progress (default: 60)')
+    cache_group.add_argument('--cache-ttl-future', type=int, default=21600,
+                           help='Adaptive TTL in seconds for future hours (default: 21600)')
+    cache_group.add_argument('--cache-backend', choices=sorted(CACHE_BACKENDS), default='files',
+                           help='Cache storage: one file per hour, or a single SQLite database (default: files)')
+    cache_group.add_argument('--max-stale', type=int, default=0,
+                           help='Serve cached data up to this many seconds past its TTL and refresh it '
+                                'in the background (default: 0, disabled)')
     cache_group.add_argument('--no-cache', action='store_true',
                            help='Disable cache usage')
     cache_group.add_argument('--cache-only', action='store_true',
@@ -674,18 +1392,25 @@ Examples:
                        help='API request timeout in seconds (default: 30)')
     parser.add_argument('--retries', type=int, default=3,
                        help='Maximum API retry attempts (default: 3)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'Number of concurrent API requests (default: {DEFAULT_WORKERS})')
     
     args = parser.parse_args()
     
+    # Verbose messages go through logging so their formatting is skipped when off;
+    # only our own logger is raised to DEBUG, not requests/urllib3
+    logging.basicConfig(format='%(message)s')
+    log.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    
     # Handle cache management commands
     if args.clear_cache:
-        cache = CacheManager()
+        cache = CacheManager(backend=args.cache_backend)
         cache.clear_cache()
         print("Cache cleared successfully")
         sys.exit(0)
     
     if args.cache_stats:
-        cache = CacheManager()
+        cache = CacheManager(backend=args.cache_backend)
         stats = cache.get_cache_stats()
         print(f"Cache statistics:")
         print(f"  Files: {stats['files']}")
@@ -715,11 +1440,18 @@ Examples:
             sys.exit(1)
         
         # Validate conflicting arguments
-        date_args = [args.date, args.start_date, args.end_date, args.now]
-        date_arg_count = sum(1 for arg in date_args if arg is not None)
+        # (--start-date/--end-date and --start-hour/--end-hour each count as one option)
+        date_arg_count = sum([
+            args.date is not None,
+            args.start_date is not None or args.end_date is not None,
+            args.now
+        ])
         
-        hour_args = [args.hour, args.start_hour, args.end_hour, args.now]
-        hour_arg_count = sum(1 for arg in hour_args if arg is not None)
+        hour_arg_count = sum([
+            args.hour is not None,
+            args.start_hour is not None or args.end_hour is not None,
+            args.now
+        ])
         
         # Validate --now-days is only used with --now
         if args.now_days != 7 and not args.now:
@@ -731,6 +1463,11 @@ Examples:
             print("Error: --now-days must be at least 1", file=sys.stderr)
             sys.exit(1)
         
+        # Validate --workers value
+        if args.workers < 1:
+            print("Error: --workers must be at least 1", file=sys.stderr)
+            sys.exit(1)
+        
         if date_arg_count > 1:
             print("Error: Cannot specify more than one of --date, --start-date/--end-date, or --now", file=sys.stderr)
             sys.exit(1)
@@ -759,10 +1496,11 @@ Examples:
                 print("Error: --start-hour must be less than or equal to --end-hour", file=sys.stderr)
                 sys.exit(1)
         
-        # Validate date formats
+        # Validate date formats, keeping parsed multi-day dates for the fetch
+        start_dt = end_dt = None
         if args.date is not None:
             try:
-                datetime.strptime(args.date, '%Y-%m-%d')
+                _parse_date(args.date)
             except ValueError:
                 print("Error: --date must be in YYYY-MM-DD format", file=sys.stderr)
                 sys.exit(1)
@@ -772,8 +1510,8 @@ Examples:
                 print("Error: Both --start-date and --end-date must be specified together", file=sys.stderr)
                 sys.exit(1)
             try:
-                start_dt = datetime.strptime(args.start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(args.end_date, '%Y-%m-%d')
+                start_dt = _parse_date(args.start_date)
+                end_dt = _parse_date(args.end_date)
                 if start_dt > end_dt:
                     print("Error: --start-date must be less than or equal to --end-date", file=sys.stderr)
                     sys.exit(1)
@@ -785,26 +1523,35 @@ Examples:
         # Get JSON data (from file or API)
         if args.api:
             # Fetch from API
-            if args.verbose:
+            if log.isEnabledFor(logging.DEBUG):
                 if args.now:
-                    print(f"Fetching data from API: platform={args.platform}, region={args.region}, "
-                          f"mode=now (last hour to next {args.now_days} days)")
+                    log.debug("Fetching data from API: platform=%s, region=%s, "
+                              "mode=now (last hour to next %s days)", args.platform, args.region, args.now_days)
                 elif args.date is not None:
                     if args.hour is not None:
-                        print(f"Fetching data from API: platform={args.platform}, region={args.region}, "
-                              f"date={args.date}, hour={args.hour}")
+                        log.debug("Fetching data from API: platform=%s, region=%s, date=%s, hour=%s",
+                                  args.platform, args.region, args.date, args.hour)
                     else:
-                        print(f"Fetching data from API: platform={args.platform}, region={args.region}, "
-                              f"date={args.date}, hours={args.start_hour}-{args.end_hour}")
+                        log.debug("Fetching data from API: platform=%s, region=%s, date=%s, hours=%s-%s",
+                                  args.platform, args.region, args.date, args.start_hour, args.end_hour)
                 else:
                     if args.hour is not None:
-                        print(f"Fetching data from API: platform={args.platform}, region={args.region}, "
-                              f"dates={args.start_date} to {args.end_date}, hour={args.hour}")
+                        log.debug("Fetching data from API: platform=%s, region=%s, dates=%s to %s, hour=%s",
+                                  args.platform, args.region, args.start_date, args.end_date, args.hour)
                     else:
-                        print(f"Fetching data from API: platform={args.platform}, region={args.region}, "
-                              f"dates={args.start_date} to {args.end_date}, hours={args.start_hour}-{args.end_hour}")
+                        log.debug("Fetching data from API: platform=%s, region=%s, dates=%s to %s, hours=%s-%s",
+                                  args.platform, args.region, args.start_date, args.end_date,
+                                  args.start_hour, args.end_hour)
             
-            api_client = TVGuideAPIClient()
+            # Never give the pool fewer connections than concurrent workers
+            api_client = TVGuideAPIClient(
+                max_retries=args.retries,
+                pool_size=max(32, args.workers),
+                ttl_current_hour=args.cache_ttl_current_hour,
+                ttl_future=args.cache_ttl_future,
+                cache_backend=args.cache_backend,
+                max_stale=args.max_stale
+            )
             
             if args.now:
                 # Now mode: from (now - 1 hour) to (now + N days)
@@ -820,11 +1567,10 @@ Examples:
                     view=args.view,
                     details=args.details,
                     timeout=args.timeout,
-                    max_retries=args.retries,
                     use_cache=not args.no_cache,
                     cache_ttl=args.cache_ttl,
                     cache_only=args.cache_only,
-                    verbose=args.verbose
+                    max_workers=args.workers
                 )
             elif args.date is not None:
                 # Single day mode
@@ -838,7 +1584,6 @@ Examples:
                         view=args.view,
                         details=args.details,
                         timeout=args.timeout,
-                        max_retries=args.retries,
                         use_cache=not args.no_cache,
                         cache_ttl=args.cache_ttl,
                         cache_only=args.cache_only
@@ -855,11 +1600,10 @@ Examples:
                         view=args.view,
                         details=args.details,
                         timeout=args.timeout,
-                        max_retries=args.retries,
                         use_cache=not args.no_cache,
                         cache_ttl=args.cache_ttl,
                         cache_only=args.cache_only,
-                        verbose=args.verbose
+                        max_workers=args.workers
                     )
             else:
                 # Multi-day mode
@@ -867,52 +1611,48 @@ Examples:
                     api_client=api_client,
                     platform=args.platform,
                     region=args.region,
-                    start_date=args.start_date,
-                    end_date=args.end_date,
+                    start_date=start_dt,
+                    end_date=end_dt,
                     start_hour=args.start_hour,
                     end_hour=args.end_hour,
                     view=args.view,
                     details=args.details,
                     timeout=args.timeout,
-                    max_retries=args.retries,
                     use_cache=not args.no_cache,
                     cache_ttl=args.cache_ttl,
                     cache_only=args.cache_only,
-                    verbose=args.verbose
+                    max_workers=args.workers
                 )
             
-            if args.verbose:
-                if args.cache_only:
-                    print(f"Successfully loaded data from cache")
-                else:
-                    print(f"Successfully fetched data from API")
+            if args.cache_only:
+                log.debug("Successfully loaded data from cache")
+            else:
+                log.debug("Successfully fetched data from API")
         else:
             # Read from file
-            if args.verbose:
-                print(f"Reading JSON from: {args.input}")
-            
-            with open(args.input, 'r', encoding='utf-8') as f:
-                json_data = f.read()
+            log.debug("Reading JSON from: %s", args.input)
         
         # Convert to XMLTV
-        if args.verbose:
-            print("Converting to XMLTV format...")
+        log.debug("Converting to XMLTV format...")
         
         converter = TVGuideConverter()
-        converter.parse_json(json_data)
-        tv_element = converter.generate_xmltv()
-        xml_output = converter.to_xml_string(tv_element)
+        if args.api:
+            # API results are already-decoded channel objects
+            converter.parse_channel_stream(json_data)
+        else:
+            with open(args.input, 'rb') as f:
+                converter.parse_json_stream(f)
         
         # Write output XMLTV file
-        if args.verbose:
-            print(f"Writing XMLTV to: {args.output}")
+        log.debug("Writing XMLTV to: %s", args.output)
         
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(xml_output)
+        # A large buffer turns the streamed output into few, big write() calls
+        # Write beside the output and swap it in, so a failure keeps the old guide
+        with _atomic_output(args.output, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+            converter.write_xmltv(f, pretty=args.pretty)
         
-        if args.verbose:
-            print(f"Successfully converted {len(converter.channels)} channels "
-                  f"and {len(converter.programmes)} programmes")
+        log.debug("Successfully converted %d channels and %d programmes",
+                  len(converter.channels), len(converter.programmes))
         
     except FileNotFoundError as e:
         print(f"Error: File not found - {e}", file=sys.stderr)